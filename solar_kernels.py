@@ -0,0 +1,73 @@
+# 太阳位置相关的 numba 内核。
+# 单独成模块：Streamlit 每次 rerun 都会重新执行主脚本，而被 import 的模块在进程内只加载一次，
+# 因此 JIT 分发器的构建与预热只发生一次。
+from functools import lru_cache
+
+import numpy as np
+from numba import njit, vectorize, float64, int64
+
+# solve_location_nb 的状态码（字符串无法穿过 njit 边界，用整数传递）
+FLAG_OK = 0
+FLAG_BAD_ORDER = 1
+FLAG_NEAR_EQUINOX = 2
+
+@njit(cache=True, fastmath=True)
+def declination_and_eot_nb(day_of_year):
+    B_rad = np.radians((360 / 365) * (day_of_year - 81))
+    
+    # 1. 计算均时差 (EOT) 单位：分钟
+    eot = 9.87 * np.sin(2 * B_rad) - 7.53 * np.cos(B_rad) - 1.5 * np.sin(B_rad)
+    
+    # 2. 计算太阳赤纬 (delta) 单位：弧度
+    delta_rad = np.radians(23.45 * np.sin(B_rad))
+    
+    return delta_rad, eot
+
+# 赤纬与均时差只取决于年积日（至多 366 种取值）。本模块在进程内只加载一次，lru_cache 可跨 rerun 保留
+@lru_cache(maxsize=512)
+def decl_eot(day_of_year):
+    delta_rad, eot = declination_and_eot_nb(day_of_year)
+    return float(delta_rad), float(eot)
+
+@njit(cache=True, fastmath=True)
+def solve_location_nb(delta_rad, eot_min, sr_s, ss_s, utc_offset):
+    # 计算昼长
+    day_length_seconds = ss_s - sr_s
+    if day_length_seconds <= 0:
+        return 0.0, 0.0, day_length_seconds, 0.0, FLAG_BAD_ORDER
+    
+    local_solar_noon_seconds = sr_s + day_length_seconds / 2
+    local_solar_noon_min = local_solar_noon_seconds / 60.0
+    
+    # --- 计算经度 ---
+    # 12:00 * 60 = (UTC_noon_min + Longitude_time_offset) + EOT
+    utc_noon_min = local_solar_noon_min - (utc_offset * 60)
+    longitude = (720 - utc_noon_min - eot_min) / 4.0
+    
+    # --- 计算纬度 ---
+    omega_rad = np.radians((day_length_seconds / 3600.0 / 2) * 15)
+    tan_delta = np.tan(delta_rad)
+    
+    if abs(tan_delta) < 0.001:
+        return 0.0, longitude, day_length_seconds, local_solar_noon_seconds, FLAG_NEAR_EQUINOX
+    
+    latitude = np.degrees(np.arctan(-np.cos(omega_rad) / tan_delta))
+    
+    return latitude, longitude, day_length_seconds, local_solar_noon_seconds, FLAG_OK
+
+# 导入时对两个内核各预热一次，避免首次用户请求承担 JIT 编译开销
+declination_and_eot_nb(1)
+solve_location_nb(0.0, 0.0, 6 * 3600, 18 * 3600, 8.0)
+
+# 批量版本的 ufunc 内核（纬度 / 经度各一个，导入时按显式签名编译），可直接作用于等长数组；日落不晚于日出的记录返回 NaN
+@vectorize([float64(int64, int64, int64, float64)], nopython=True, cache=True)
+def solve_lat(day_of_year, sr_s, ss_s, utc_offset):
+    delta_rad, eot_min = declination_and_eot_nb(day_of_year)
+    latitude, _, _, _, flag = solve_location_nb(delta_rad, eot_min, sr_s, ss_s, utc_offset)
+    return np.nan if flag == FLAG_BAD_ORDER else latitude
+
+@vectorize([float64(int64, int64, int64, float64)], nopython=True, cache=True)
+def solve_lon(day_of_year, sr_s, ss_s, utc_offset):
+    delta_rad, eot_min = declination_and_eot_nb(day_of_year)
+    _, longitude, _, _, flag = solve_location_nb(delta_rad, eot_min, sr_s, ss_s, utc_offset)
+    return np.nan if flag == FLAG_BAD_ORDER else longitude
@@ -1,15 +1,17 @@
 # To run:
 # E:/VSCode_Project/rent_project/.venv/Scripts/python.exe -m streamlit run E:/VSCode_Project/quant_research/sunrise_sunset.py
 import streamlit as st
+import json
 import ephem
-import math
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 import folium
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
+from solar_kernels import FLAG_BAD_ORDER, FLAG_NEAR_EQUINOX, decl_eot, solve_location_nb, solve_lat, solve_lon
 
 # ==========================================
 # 1. 核心数学与天文学算法类
@@ -22,97 +24,202 @@ class SolarMath:
     
     @staticmethod
     def get_solar_declination_and_eot(date_obj):
-        day_of_year = date_obj.timetuple().tm_yday
-        B = (360 / 365) * (day_of_year - 81)
-        B_rad = math.radians(B)
-        
-        # 1. 计算均时差 (EOT) 单位：分钟
-        eot = 9.87 * math.sin(2 * B_rad) - 7.53 * math.cos(B_rad) - 1.5 * math.sin(B_rad)
-        
-        # 2. 计算太阳赤纬 (delta) 单位：弧度
-        delta_deg = 23.45 * math.sin(B_rad)
-        delta_rad = math.radians(delta_deg)
-        
-        return delta_rad, eot
+        return decl_eot(date_obj.timetuple().tm_yday)
 
     @staticmethod
+    # 主体只是一次数微秒的 njit 调用，不经 st.cache_data：其参数哈希与结果反序列化反而要数百微秒
     def solve_location(target_date, sunrise_time, sunset_time, utc_offset):
+        """
+        返回 ((纬度, 经度, 昼长秒数, 当地太阳正午秒数), 提示信息)；出错时第一项为 None。
+        """
         # 将时间转换为当天的秒数
         sr_seconds = sunrise_time.hour * 3600 + sunrise_time.minute * 60 + sunrise_time.second
         ss_seconds = sunset_time.hour * 3600 + sunset_time.minute * 60 + sunset_time.second
         
-        # 计算昼长
-        day_length_seconds = ss_seconds - sr_seconds
-        if day_length_seconds <= 0:
-            return None, "错误：日落时间必须晚于日出时间"
-        
-        local_solar_noon_seconds = sr_seconds + day_length_seconds / 2
-        local_solar_noon_min = local_solar_noon_seconds / 60.0
-        
-        delta_rad, eot_min = SolarMath.get_solar_declination_and_eot(target_date)
-        
-        # --- 计算经度 ---
-        # 12:00 * 60 = (UTC_noon_min + Longitude_time_offset) + EOT
-        utc_noon_min = local_solar_noon_min - (utc_offset * 60)
-        long_offset_min = 720 - utc_noon_min - eot_min
-        longitude = long_offset_min / 4.0
+        delta_rad, eot_min = decl_eot(target_date.timetuple().tm_yday)
+        latitude, longitude, day_length_seconds, local_solar_noon_seconds, flag = solve_location_nb(
+            delta_rad, eot_min, sr_seconds, ss_seconds, float(utc_offset)
+        )
         
-        # --- 计算纬度 ---
-        day_length_hours = day_length_seconds / 3600.0
-        omega_deg = (day_length_hours / 2) * 15
-        omega_rad = math.radians(omega_deg)
-        
-        tan_delta = math.tan(delta_rad)
-        
-        if abs(tan_delta) < 0.001:
-            return (0.0, longitude), "警告：接近春秋分，纬度计算可能不准确（默认为赤道附近）"
-        
-        tan_phi = -math.cos(omega_rad) / tan_delta
-        phi_rad = math.atan(tan_phi)
-        latitude = math.degrees(phi_rad)
+        if flag == FLAG_BAD_ORDER:
+            return None, "错误：日落时间必须晚于日出时间"
+        if flag == FLAG_NEAR_EQUINOX:
+            return (latitude, longitude, day_length_seconds, local_solar_noon_seconds), "警告：接近春秋分，纬度计算可能不准确（默认为赤道附近）"
         
-        return (latitude, longitude), None
+        return (latitude, longitude, day_length_seconds, local_solar_noon_seconds), None
+
+    @staticmethod
+    def solve_location_batch(day_of_year, sr_seconds, ss_seconds, utc_offset):
+        """
+        solve_location 的批量版本：输入年积日、日出 / 日落秒数与时区偏移（标量或等长数组），返回 (纬度数组, 经度数组)。
+        """
+        args = (
+            np.asarray(day_of_year, dtype=np.int64),
+            np.asarray(sr_seconds, dtype=np.int64),
+            np.asarray(ss_seconds, dtype=np.int64),
+            np.asarray(utc_offset, dtype=np.float64),
+        )
+        return solve_lat(*args), solve_lon(*args)
 
 # ==========================================
 # 2. Ephem 计算引擎
 # ==========================================
 
-def calculate_schedule(lat, lon, start_date, days=30):
+@st.cache_data(show_spinner=False, max_entries=32)
+def calculate_schedule(lat, lon, start_date, days=30, fast=True):
+    """
+    fast=True 时使用 NOAA / Meeus 解析公式整段向量化计算，仅对极昼 / 极夜交界附近解析式误差会被放大的少数日期改用 ephem，
+    与 ephem 相比误差约 30 秒以内；fast=False 时逐日调用 ephem 迭代求解，慢得多。
+    两种方式都为每天保留一行，极昼 / 极夜日期的日出日落与昼长为 NaT。
+    """
+    if fast:
+        return calculate_schedule_vec(lat, lon, start_date, days)
+
+    observer = _make_observer(lat, lon)
+    sun = ephem.Sun()
+
+    # 预分配定型数组，避免逐行 dict 构造与 pandas 的类型推断；未求得日出日落的日期保持 NaT
+    dates = np.empty(days, 'datetime64[D]')
+    rises = np.full(days, np.datetime64('NaT'), 'datetime64[us]')
+    sets = np.full(days, np.datetime64('NaT'), 'datetime64[us]')
+
+    current_date = start_date
+    for i in range(days):
+        dates[i] = np.datetime64(current_date, 'D')
+        events = _ephem_rise_set(observer, sun, current_date, lon)
+        if events is not None:
+            rises[i] = np.datetime64(events[0])
+            sets[i] = np.datetime64(events[1])
+
+        current_date += timedelta(days=1)
+
+    df = pd.DataFrame({
+        "日期": dates,
+        "日出UTC": rises,
+        "日落UTC": sets,
+        "昼长": sets - rises
+    })
+        
+    return df
+
+def _make_observer(lat, lon):
     observer = ephem.Observer()
     observer.lat = str(lat)
     observer.lon = str(lon)
     observer.elevation = 0
+    return observer
+
+def _ephem_rise_set(observer, sun, day, lon):
+    """
+    用 ephem 求 day 当天的 (日出UTC, 日落UTC)，极昼 / 极夜返回 None。
+    """
+    # 从当地平太阳时零点开始搜索，使日出日落都落在当地同一天
+    observer.date = ephem.Date(day) - lon / 360
+    try:
+        # 两个时刻都求出后再返回，避免只有日出、没有日落的半截行；
+        # 日落从日出时刻起搜索，避免午夜后不久的日落排在日出之前、昼长为负
+        rise = observer.next_rising(sun)
+        return rise.datetime(), observer.next_setting(sun, start=rise).datetime()
+    except (ephem.AlwaysUpError, ephem.NeverUpError):
+        return None
+
+# 日出日落时太阳中心位于地平线下的角度：与 ephem 默认大气（1010 hPa, 15°C）的地平折射 + 视半径一致
+_HORIZON_DEPRESSION_DEG = 0.885
+
+def _sun_decl_eqtime(jd):
+    """
+    按 NOAA 太阳计算表（Meeus 低精度太阳坐标）计算给定儒略日的太阳赤纬（弧度）与均时差（分钟），支持数组输入。
+    """
+    T = (jd - 2451545.0) / 36525.0
+    L0 = np.radians((280.46646 + T * (36000.76983 + T * 0.0003032)) % 360)
+    M = np.radians(357.52911 + T * (35999.05029 - 0.0001537 * T))
+    e = 0.016708634 - T * (0.000042037 + 0.0000001267 * T)
     
-    sun = ephem.Sun()
-    data = []
+    # 中心差与视黄经
+    C = (np.sin(M) * (1.914602 - T * (0.004817 + 0.000014 * T))
+         + np.sin(2 * M) * (0.019993 - 0.000101 * T)
+         + np.sin(3 * M) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * T)
+    app_long = L0 + np.radians(C - 0.00569 - 0.00478 * np.sin(omega))
     
-    current_date = start_date
-    for _ in range(days):
-        observer.date = current_date
-        try:
-            next_rising = observer.next_rising(sun)
-            next_setting = observer.next_setting(sun)
-            
-            rise_utc = next_rising.datetime()
-            set_utc = next_setting.datetime()
-            day_len = set_utc - rise_utc
-            
-            data.append({
-                "日期": current_date, 
-                "日出UTC": rise_utc,
-                "日落UTC": set_utc,
-                "昼长": day_len
-            })
-        except (ephem.AlwaysUpError, ephem.AlwaysDownError):
-            pass 
-            
-        current_date += timedelta(days=1)
+    # 黄赤交角
+    eps = np.radians(23 + (26 + (21.448 - T * (46.815 + T * (0.00059 - T * 0.001813))) / 60) / 60
+                     + 0.00256 * np.cos(omega))
     
-    df = pd.DataFrame(data)
-    if not df.empty:
-        df["日期"] = pd.to_datetime(df["日期"])
-        
-    return df
+    decl = np.arcsin(np.sin(eps) * np.sin(app_long))
+    y = np.tan(eps / 2) ** 2
+    eqtime = 4 * np.degrees(y * np.sin(2 * L0) - 2 * e * np.sin(M) + 4 * e * y * np.sin(M) * np.cos(2 * L0)
+                            - 0.5 * y * y * np.sin(4 * L0) - 1.25 * e * e * np.sin(2 * M))
+    return decl, eqtime
+
+# 解析式的太阳高度误差约 0.006°；事件时刻 d(sin h)/dH 低于此值的日期，换算成时间误差会超过约 20 秒
+_MIN_ALTITUDE_SLOPE = 0.08
+# |cos_ha| 超过 1 的幅度（换算为 sin h）小于此值时，解析式与 ephem 对是否为极昼 / 极夜可能判断不一
+_POLAR_EDGE_MARGIN = np.radians(0.01)
+
+def _event_minutes(lat, lon, jd0, sign):
+    """
+    日出 (sign=+1) / 日落 (sign=-1) 距当天 UTC 零点的分钟数，以及解析结果不可靠、需改用 ephem 的日期掩码。
+    先在正午估算一次，再在估算出的事件时刻重新计算太阳坐标（两轮迭代）。
+    """
+    lat_rad = np.radians(lat)
+    cos_depression = np.cos(np.radians(90 + _HORIZON_DEPRESSION_DEG))
+    minutes = 720 - 4 * lon
+    for _ in range(2):
+        decl, eqtime = _sun_decl_eqtime(jd0 + minutes / 1440)
+        cos_ha = cos_depression / (np.cos(lat_rad) * np.cos(decl)) - np.tan(lat_rad) * np.tan(decl)
+        ha_deg = np.degrees(np.arccos(np.clip(cos_ha, -1, 1)))
+        minutes = 720 - 4 * (lon + sign * ha_deg) - eqtime
+    # |cos_ha| > 1 对应极昼 / 极夜，用掩码整体置为 NaN（转换后即 NaT），不走异常分支
+    polar = np.abs(cos_ha) > 1
+    minutes[polar] = np.nan
+    # 极昼 / 极夜交界附近太阳高度随时间变化很慢，坐标的微小误差会放大成数分钟的时间误差
+    scale = np.cos(lat_rad) * np.cos(decl)
+    slope = scale * np.sqrt(np.clip(1 - cos_ha ** 2, 0, None))
+    unreliable = np.where(polar, (np.abs(cos_ha) - 1) * scale < _POLAR_EDGE_MARGIN, slope < _MIN_ALTITUDE_SLOPE)
+    return minutes, unreliable
+
+def calculate_schedule_vec(lat, lon, start_date, days=30):
+    """
+    calculate_schedule 的 NumPy 向量化版本：整段日期一次性计算，仅极昼 / 极夜交界附近的少数日期逐日交给 ephem。
+    """
+    n = np.arange(days)
+    dates = np.datetime64(start_date, 'D') + n
+    # 当天 UTC 零点的儒略日（1970-01-01 00:00 UTC = JD 2440587.5）
+    jd0 = dates.astype(np.int64) + 2440587.5
+
+    rise, rise_unreliable = _event_minutes(lat, lon, jd0, 1)
+    set_, set_unreliable = _event_minutes(lat, lon, jd0, -1)
+    # 日出 / 日落任一缺失时整行置空，保证不出现半截行
+    polar = np.isnan(rise) | np.isnan(set_)
+    rise[polar] = np.nan
+    set_[polar] = np.nan
+
+    # 解析结果不可靠的日期（每年每地通常只有几天）逐日改用 ephem 重算
+    refine = np.flatnonzero(rise_unreliable | set_unreliable)
+    if refine.size:
+        observer = _make_observer(lat, lon)
+        sun = ephem.Sun()
+        for i in refine:
+            day = dates[i].item()
+            events = _ephem_rise_set(observer, sun, day, lon)
+            if events is None:
+                rise[i] = set_[i] = np.nan
+            else:
+                midnight = datetime.combine(day, time())
+                rise[i] = (events[0] - midnight).total_seconds() / 60
+                set_[i] = (events[1] - midnight).total_seconds() / 60
+
+    base_dates = pd.to_datetime(dates)
+    rise_utc = base_dates + pd.to_timedelta(rise, unit='m')
+    set_utc = base_dates + pd.to_timedelta(set_, unit='m')
+
+    return pd.DataFrame({
+        "日期": base_dates,
+        "日出UTC": rise_utc,
+        "日落UTC": set_utc,
+        "昼长": set_utc - rise_utc
+    })
 
 # ==========================================
 # 3. Streamlit 界面逻辑
@@ -141,6 +248,187 @@ def ui_time_input_precise(label, default_h, default_m, default_s, key_prefix):
         st.caption("秒")
     return time(h, m, s)
 
+# --- 辅助函数：缓存图表构建（以数组字节为键，数据不变时跳过 Plotly 对象构建）---
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_fig_json(dates_bytes, rise_bytes, set_bytes):
+    dates = np.frombuffer(dates_bytes, dtype='datetime64[ns]')
+    rises = np.frombuffer(rise_bytes, dtype='datetime64[ns]')
+    sets = np.frombuffer(set_bytes, dtype='datetime64[ns]')
+    
+    # 创建双 Y 轴图表对象
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # 添加日出线 (左轴)
+    fig.add_trace(
+        go.Scatter(
+            x=dates, 
+            y=rises, 
+            name="日出时间",
+            mode='lines+markers',
+            line=dict(color='#FFA500', width=2), # 橙色
+            hovertemplate='<b>日期</b>: %{x|%Y-%m-%d}<br><b>日出</b>: %{y|%H:%M:%S}<extra></extra>' # 自定义悬停显示
+        ),
+        secondary_y=False,
+    )
+
+    # 添加日落线 (右轴)
+    fig.add_trace(
+        go.Scatter(
+            x=dates, 
+            y=sets, 
+            name="日落时间",
+            mode='lines+markers',
+            line=dict(color='#1f77b4', width=2), # 蓝色
+            hovertemplate='<b>日期</b>: %{x|%Y-%m-%d}<br><b>日落</b>: %{y|%H:%M:%S}<extra></extra>'
+        ),
+        secondary_y=True,
+    )
+
+    # 设置布局
+    fig.update_layout(
+        height=500,
+        hovermode="x unified", # 关键：开启X轴统一悬停（会出现纵向虚线，同时显示两个数据）
+        xaxis=dict(
+            title="日期",
+            tickformat="%Y-%m-%d",
+            showgrid=True,
+            gridcolor='rgba(128,128,128,0.2)'
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        margin=dict(l=20, r=20, t=50, b=20)
+    )
+
+    # 设置 Y 轴格式 (只显示时:分)
+    fig.update_yaxes(
+        title_text="日出时间", 
+        tickformat="%H:%M", 
+        showgrid=True, 
+        gridcolor='rgba(128,128,128,0.2)',
+        secondary_y=False
+    )
+    fig.update_yaxes(
+        title_text="日落时间", 
+        tickformat="%H:%M", 
+        showgrid=False, # 右轴网格线关掉，避免太乱
+        secondary_y=True
+    )
+
+    # 紧凑序列化并去掉 trace uid，减小前端负载
+    return pio.to_json(fig, pretty=False, remove_uids=True)
+
+# --- 辅助函数：缓存 CSV 编码结果，数据不变时 rerun 直接复用 ---
+@st.cache_data(show_spinner=False, max_entries=32)
+def _csv_bytes(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+# --- 趋势分析区块：用 st.fragment 包裹，调整其中控件时只重跑本区块 ---
+@st.fragment
+def render_trend_section(lat, lon, input_date, utc_offset):
+    st.header("📈 趋势分析与图表")
+    
+    c1, c2 = st.columns(2)
+    with c1:
+        calc_start_date = st.date_input("开始日期", input_date)
+    with c2:
+        days_to_calc = st.number_input("预测天数", 1, 365, 60) 
+    
+    # 1. 计算基础数据（经纬度取 4 位小数作为缓存键，提高同一地点的命中率）
+    schedule_df = calculate_schedule(round(lat, 4), round(lon, 4), calc_start_date, days_to_calc)
+    
+    # 极昼 / 极夜日期没有日出日落（NaT），统计与展示前统一剔除
+    schedule_df = schedule_df.dropna(subset=["日出UTC", "日落UTC"]).reset_index(drop=True)
+    if schedule_df.empty:
+        st.warning("所选日期范围内均为极昼或极夜，没有日出日落数据。")
+        return
+    
+    # 2. 数据处理：转换时区并格式化
+    local_tz = timezone(timedelta(hours=utc_offset))
+    
+    # 为 Plotly 准备数据
+    # 标记为 UTC 后转换到固定偏移时区，只改时区元数据，不做逐元素加法
+    schedule_df["LocalRise"] = schedule_df["日出UTC"].dt.tz_localize("UTC").dt.tz_convert(local_tz)
+    schedule_df["LocalSet"] = schedule_df["日落UTC"].dt.tz_localize("UTC").dt.tz_convert(local_tz)
+    
+    # 为了在Y轴上只比较时间（忽略日期的影响），我们创建一个 dummy 时间列
+    # 统一把日期设为 2000-01-01，只保留时分秒差异（减去当天零点得到 Timedelta，整列一次完成）
+    dummy_base = pd.Timestamp("2000-01-01")
+    schedule_df["DummyRise"] = dummy_base + (schedule_df["LocalRise"] - schedule_df["LocalRise"].dt.normalize()).dt.floor("s")
+    schedule_df["DummySet"] = dummy_base + (schedule_df["LocalSet"] - schedule_df["LocalSet"].dt.normalize()).dt.floor("s")
+    
+    # 统计极值
+    local_rises = schedule_df["LocalRise"]
+    local_sets = schedule_df["LocalSet"]
+    
+    # 向量化提取当天秒数 (time-of-day)，避免逐行 .apply 装箱
+    rise_tod = local_rises.dt.hour * 3600 + local_rises.dt.minute * 60 + local_rises.dt.second
+    set_tod = local_sets.dt.hour * 3600 + local_sets.dt.minute * 60 + local_sets.dt.second
+
+    # argmin / argmax 在并列时取第一次出现的位置，与 idxmin / idxmax 一致
+    earliest_rise_idx = int(rise_tod.values.argmin())
+    latest_rise_idx = int(rise_tod.values.argmax())
+    earliest_set_idx = int(set_tod.values.argmin())
+    latest_set_idx = int(set_tod.values.argmax())
+    
+    # 一次 fancy-index 取出 4 个关键行，再整列格式化
+    key_rows = schedule_df.iloc[[earliest_rise_idx, latest_rise_idx, earliest_set_idx, latest_set_idx]]
+    key_dates = key_rows["日期"].dt.strftime("%m-%d").tolist()
+    key_rises = key_rows["LocalRise"].dt.strftime("%H:%M:%S").tolist()
+    key_sets = key_rows["LocalSet"].dt.strftime("%H:%M:%S").tolist()
+    
+    st.subheader("📊 关键时间节点")
+    k1, k2, k3, k4 = st.columns(4)
+    
+    with k1:
+        st.metric("最早日出", key_rises[0], delta=f"日期: {key_dates[0]}", delta_color="inverse")
+        
+    with k2:
+        st.metric("最晚日出", key_rises[1], delta=f"日期: {key_dates[1]}", delta_color="inverse")
+
+    with k3:
+        st.metric("最早日落", key_sets[2], delta=f"日期: {key_dates[2]}", delta_color="off")
+        
+    with k4:
+        st.metric("最晚日落", key_sets[3], delta=f"日期: {key_dates[3]}")
+
+    # --- 可视化图表 (Plotly Chart) ---
+    st.subheader("📉 日出日落趋势图 (双Y轴独立)")
+    
+    fig_json = build_fig_json(
+        schedule_df["日期"].values.astype('datetime64[ns]').tobytes(),
+        schedule_df["DummyRise"].values.astype('datetime64[ns]').tobytes(),
+        schedule_df["DummySet"].values.astype('datetime64[ns]').tobytes(),
+    )
+
+    # 渲染图表
+    st.plotly_chart(json.loads(fig_json), use_container_width=True, theme=None,
+                    config={"staticPlot": False, "responsive": True})
+    
+    # --- 详细数据表格 ---
+    with st.expander("查看详细数据表"):
+        # 昼长按整秒拆成 时:分:秒，一次算术完成，不再逐行转字符串再切分
+        day_len_secs = schedule_df["昼长"].dt.total_seconds().astype('int64').values
+        hours, rem = np.divmod(day_len_secs, 3600)
+        minutes, seconds = np.divmod(rem, 60)
+        day_len_str = [f"{hh}:{mm:02d}:{ss:02d}" for hh, mm, ss in zip(hours, minutes, seconds)]
+
+        display_table = pd.DataFrame({
+            "日期": schedule_df["日期"].dt.strftime("%Y-%m-%d"),
+            f"日出 (UTC{utc_offset:+.1f})": schedule_df["LocalRise"].dt.strftime("%H:%M:%S"),
+            f"日落 (UTC{utc_offset:+.1f})": schedule_df["LocalSet"].dt.strftime("%H:%M:%S"),
+            "昼长": day_len_str
+        })
+        
+        st.dataframe(display_table, use_container_width=True, hide_index=True)
+        
+        csv = _csv_bytes(display_table)
+        st.download_button("下载 CSV 数据表", csv, "solar_data.csv", "text/csv")
+
 # --- 侧边栏：输入区域 ---
 with st.sidebar:
     st.header("1. 输入观测数据")
@@ -191,7 +479,7 @@ if st.session_state.has_calculated:
         if error_msg and result is None:
             st.error(error_msg)
         else:
-            lat, lon = result
+            lat, lon, day_len_seconds, _ = result
             st.success("计算完成！")
             
             # --- 第一部分：反推结果展示 ---
@@ -204,160 +492,23 @@ if st.session_state.has_calculated:
                 if isinstance(error_msg, str):
                     st.warning(error_msg)
                 
-                day_len_seconds = (input_sunset.hour * 3600 + input_sunset.minute * 60 + input_sunset.second) - \
-                                  (input_sunrise.hour * 3600 + input_sunrise.minute * 60 + input_sunrise.second)
                 st.caption(f"输入日照时长: {day_len_seconds} 秒")
 
             with col_map:
                 m = folium.Map(location=[lat, lon], zoom_start=6)
                 folium.Marker([lat, lon], popup="推算位置", icon=folium.Icon(color="red", icon="sun-o", prefix="fa")).add_to(m)
-                st_folium(m, width=500, height=350)
+                # 地图仅作展示、不读取回传值，用静态 HTML 嵌入代替 st_folium 的双向通信
+                # 新版 Streamlit 以 st.iframe 取代已弃用的 components.html；requirements 下限 1.37 尚无 st.iframe，故保留回退
+                map_html = m.get_root().render()
+                if hasattr(st, "iframe"):
+                    st.iframe(map_html, width=500, height=350)
+                else:
+                    components.html(map_html, width=500, height=350)
             
             st.divider()
             
-            # --- 第二部分：正推与可视化 ---
-            st.header("📈 趋势分析与图表")
-            
-            c1, c2 = st.columns(2)
-            with c1:
-                calc_start_date = st.date_input("开始日期", input_date)
-            with c2:
-                days_to_calc = st.number_input("预测天数", 1, 365, 60) 
-            
-            # 1. 计算基础数据
-            schedule_df = calculate_schedule(lat, lon, calc_start_date, days_to_calc)
-            
-            # 2. 数据处理：转换时区并格式化
-            offset_delta = timedelta(hours=utc_offset)
-            
-            # 为 Plotly 准备数据
-            # 使用列表推导式直接生成本地时间列
-            schedule_df["LocalRise"] = schedule_df["日出UTC"] + offset_delta
-            schedule_df["LocalSet"] = schedule_df["日落UTC"] + offset_delta
-            
-            # 为了在Y轴上只比较时间（忽略日期的影响），我们创建一个 dummy 时间列
-            # 统一把日期设为 2000-01-01，只保留时分秒差异
-            def to_dummy_datetime(dt):
-                return datetime(2000, 1, 1, dt.hour, dt.minute, dt.second)
-            
-            schedule_df["DummyRise"] = schedule_df["LocalRise"].apply(to_dummy_datetime)
-            schedule_df["DummySet"] = schedule_df["LocalSet"].apply(to_dummy_datetime)
-            
-            # 统计极值
-            local_rises = schedule_df["LocalRise"]
-            local_sets = schedule_df["LocalSet"]
-            
-            earliest_rise_idx = local_rises.apply(lambda x: x.time()).idxmin()
-            latest_rise_idx = local_rises.apply(lambda x: x.time()).idxmax()
-            earliest_set_idx = local_sets.apply(lambda x: x.time()).idxmin()
-            latest_set_idx = local_sets.apply(lambda x: x.time()).idxmax()
-            
-            st.subheader("📊 关键时间节点")
-            k1, k2, k3, k4 = st.columns(4)
-            
-            with k1:
-                r_date = schedule_df.iloc[earliest_rise_idx]["日期"].strftime("%m-%d")
-                r_time = local_rises.iloc[earliest_rise_idx].strftime("%H:%M:%S")
-                st.metric("最早日出", r_time, delta=f"日期: {r_date}", delta_color="inverse")
-                
-            with k2:
-                r_date = schedule_df.iloc[latest_rise_idx]["日期"].strftime("%m-%d")
-                r_time = local_rises.iloc[latest_rise_idx].strftime("%H:%M:%S")
-                st.metric("最晚日出", r_time, delta=f"日期: {r_date}", delta_color="inverse")
-
-            with k3:
-                s_date = schedule_df.iloc[earliest_set_idx]["日期"].strftime("%m-%d")
-                s_time = local_sets.iloc[earliest_set_idx].strftime("%H:%M:%S")
-                st.metric("最早日落", s_time, delta=f"日期: {s_date}", delta_color="off")
-                
-            with k4:
-                s_date = schedule_df.iloc[latest_set_idx]["日期"].strftime("%m-%d")
-                s_time = local_sets.iloc[latest_set_idx].strftime("%H:%M:%S")
-                st.metric("最晚日落", s_time, delta=f"日期: {s_date}")
-
-            # --- 可视化图表 (Plotly Chart) ---
-            st.subheader("📉 日出日落趋势图 (双Y轴独立)")
-            
-            # 创建双 Y 轴图表对象
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-
-            # 添加日出线 (左轴)
-            fig.add_trace(
-                go.Scatter(
-                    x=schedule_df["日期"], 
-                    y=schedule_df["DummyRise"], 
-                    name="日出时间",
-                    mode='lines+markers',
-                    line=dict(color='#FFA500', width=2), # 橙色
-                    hovertemplate='<b>日期</b>: %{x|%Y-%m-%d}<br><b>日出</b>: %{y|%H:%M:%S}<extra></extra>' # 自定义悬停显示
-                ),
-                secondary_y=False,
-            )
-
-            # 添加日落线 (右轴)
-            fig.add_trace(
-                go.Scatter(
-                    x=schedule_df["日期"], 
-                    y=schedule_df["DummySet"], 
-                    name="日落时间",
-                    mode='lines+markers',
-                    line=dict(color='#1f77b4', width=2), # 蓝色
-                    hovertemplate='<b>日期</b>: %{x|%Y-%m-%d}<br><b>日落</b>: %{y|%H:%M:%S}<extra></extra>'
-                ),
-                secondary_y=True,
-            )
-
-            # 设置布局
-            fig.update_layout(
-                height=500,
-                hovermode="x unified", # 关键：开启X轴统一悬停（会出现纵向虚线，同时显示两个数据）
-                xaxis=dict(
-                    title="日期",
-                    tickformat="%Y-%m-%d",
-                    showgrid=True,
-                    gridcolor='rgba(128,128,128,0.2)'
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                ),
-                margin=dict(l=20, r=20, t=50, b=20)
-            )
-
-            # 设置 Y 轴格式 (只显示时:分)
-            fig.update_yaxes(
-                title_text="日出时间", 
-                tickformat="%H:%M", 
-                showgrid=True, 
-                gridcolor='rgba(128,128,128,0.2)',
-                secondary_y=False
-            )
-            fig.update_yaxes(
-                title_text="日落时间", 
-                tickformat="%H:%M", 
-                showgrid=False, # 右轴网格线关掉，避免太乱
-                secondary_y=True
-            )
-
-            # 渲染图表
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # --- 详细数据表格 ---
-            with st.expander("查看详细数据表"):
-                display_table = pd.DataFrame({
-                    "日期": schedule_df["日期"].dt.strftime("%Y-%m-%d"),
-                    f"日出 (UTC{utc_offset:+.1f})": schedule_df["LocalRise"].dt.strftime("%H:%M:%S"),
-                    f"日落 (UTC{utc_offset:+.1f})": schedule_df["LocalSet"].dt.strftime("%H:%M:%S"),
-                    "昼长": schedule_df["昼长"].astype(str).str.split('.').str[0]
-                })
-                
-                st.dataframe(display_table, use_container_width=True, hide_index=True)
-                
-                csv = display_table.to_csv(index=False).encode('utf-8')
-                st.download_button("下载 CSV 数据表", csv, "solar_data.csv", "text/csv")
+            # --- 第二部分：正推与可视化（独立 fragment）---
+            render_trend_section(lat, lon, input_date, utc_offset)
 
 else:
 